@@ -1,10 +1,13 @@
 import streamlit as st
-import base64
-import os
-import tempfile
-from b2sdk.v2 import InMemoryAccountInfo, B2Api
+from b2sdk.v2 import InMemoryAccountInfo, B2Api, UploadSourceStream
+import hashlib
 import io
+import os
 import time
+from collections import OrderedDict
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from operator import attrgetter
 
 # Configuração da página
 st.set_page_config(
@@ -34,136 +37,320 @@ def initialize_b2():
     return b2_api, bucket
 
 # Função para baixar arquivo do Backblaze
-def download_file_from_b2(bucket, file_id, file_name):
-    """Baixa um arquivo do Backblaze B2 para um arquivo temporário"""
-    temp_dir = tempfile.gettempdir()
-    temp_file_path = os.path.join(temp_dir, file_name)
+def download_file_from_b2(bucket, file_id):
+    """Baixa um arquivo do Backblaze B2 em memória e retorna seu conteúdo em bytes"""
+    buffer = io.BytesIO()
+    bucket.download_file_by_id(file_id).save(buffer)
+    return buffer.getvalue()
+
+# Quantidade de PDFs mantidos em memória por sessão
+PDF_CACHE_SIZE = 3
+
+# Função para obter um PDF com cache na sessão
+def get_pdf(bucket, file_id):
+    """Retorna o conteúdo do PDF, reaproveitando downloads já feitos na sessão
+
+    Mantém apenas os últimos PDF_CACHE_SIZE arquivos para limitar o uso de
+    memória.
+    """
+    if 'pdf_cache' not in st.session_state:
+        st.session_state.pdf_cache = OrderedDict()
+    pdf_cache = st.session_state.pdf_cache
     
-    # Tenta fazer o download usando a API B2
-    try:
-        # Baixa o arquivo para o local temporário
-        download_dest = bucket.download_file_by_id(file_id)
-        with open(temp_file_path, 'wb') as f:
-            download_dest.save(f)
-            
-        # Lê o conteúdo do arquivo
-        with open(temp_file_path, 'rb') as f:
-            file_content = f.read()
-            
-        # Remove o arquivo temporário
-        if os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
-            
-        return file_content
-    except Exception as e:
-        st.error(f"Erro ao baixar arquivo: {str(e)}")
-        raise e
+    if file_id in pdf_cache:
+        pdf_cache.move_to_end(file_id)
+    else:
+        pdf_cache[file_id] = download_file_from_b2(bucket, file_id)
+        while len(pdf_cache) > PDF_CACHE_SIZE:
+            pdf_cache.popitem(last=False)
+    
+    return pdf_cache[file_id]
+
+# Tamanho mínimo de parte aceito pelo B2 em uploads multipart
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+# Número de partes em que o upload é dividido para envio em paralelo
+UPLOAD_PARTS = 5
+
+# Função para enviar arquivo ao Backblaze
+def upload_file_to_b2(bucket, uploaded_file, file_name):
+    """Envia um arquivo ao Backblaze B2 em partes, sem copiar seu conteúdo"""
+    file_size = uploaded_file.size
+    
+    # Cada parte abre seu próprio leitor sobre o mesmo buffer, permitindo o
+    # envio concorrente das partes pelo b2sdk (um BytesIO não modificado
+    # devolve em getvalue() o próprio buffer, sem cópia)
+    upload_source = UploadSourceStream(
+        lambda: io.BytesIO(uploaded_file.getvalue()), stream_length=file_size
+    )
+    return bucket.upload(
+        upload_source,
+        file_name,
+        content_type='application/pdf',
+        min_part_size=max(MIN_PART_SIZE, -(-file_size // UPLOAD_PARTS))
+    )
+
+# Número máximo de transferências simultâneas com o B2
+MAX_TRANSFER_WORKERS = 10
+
+# Executor compartilhado entre todas as sessões
+@st.cache_resource
+def get_transfer_executor():
+    """Retorna o pool de threads usado nas transferências em lote
+
+    Por ser um recurso global, limita a concorrência total mesmo quando
+    várias sessões transferem arquivos ao mesmo tempo.
+    """
+    return ThreadPoolExecutor(max_workers=MAX_TRANSFER_WORKERS)
+
+# Função para enviar vários arquivos em paralelo
+def upload_many(bucket, uploaded_files):
+    """Envia vários arquivos ao Backblaze B2 em paralelo
+
+    Retorna pares (arquivo, future) na ordem de uploaded_files, permitindo
+    tratar o resultado de cada envio individualmente.
+    """
+    executor = get_transfer_executor()
+    return [
+        (uploaded_file, executor.submit(
+            upload_file_to_b2, bucket, uploaded_file, uploaded_file.name
+        ))
+        for uploaded_file in uploaded_files
+    ]
+
+# Validade (em segundos) da autorização de download do bucket
+DOWNLOAD_AUTH_VALID_DURATION = 3600
+
+# Função para obter a autorização de download do bucket
+@st.cache_data(ttl=DOWNLOAD_AUTH_VALID_DURATION - 60, show_spinner=False)
+def get_download_token(_bucket):
+    """Gera uma autorização de download válida para todos os arquivos do bucket
+
+    Fica em cache até pouco antes de expirar, de modo que uma única chamada
+    ao B2 assina todas as URLs. Erros não são guardados em cache: a próxima
+    chamada tenta de novo.
+    """
+    return _bucket.get_download_authorization("", DOWNLOAD_AUTH_VALID_DURATION)
 
 # Função para gerar URL assinada
-def get_signed_url(bucket, file_name, valid_duration=60):
-    """Gera uma URL assinada para acesso temporário ao arquivo"""
-    try:
-        # Obtém autorização de download
-        auth_token = bucket.get_download_authorization(
-            file_name, valid_duration
+def get_signed_url(bucket, file_name):
+    """Monta a URL assinada do arquivo a partir da autorização do bucket"""
+    return f"{bucket.get_download_url(file_name)}?Authorization={get_download_token(bucket)}"
+
+# Pasta servida pelo Streamlit em app/static (server.enableStaticServing)
+# Atenção: qualquer cliente acessa esta pasta sem autenticação, por isso os
+# PDFs publicados ali são removidos após STATIC_MAX_AGE segundos e a pasta
+# guarda no máximo STATIC_MAX_FILES arquivos
+STATIC_DIR = Path(__file__).parent / "static"
+STATIC_MAX_AGE = 15 * 60
+STATIC_MAX_FILES = 20
+
+# Índice file_id -> nome do arquivo estático, compartilhado entre sessões
+@st.cache_resource
+def get_static_index():
+    """Retorna o índice dos PDFs já publicados na pasta estática"""
+    return {}
+
+# Função para limpar a pasta estática
+def cleanup_static_dir():
+    """Remove PDFs expirados e mantém a pasta dentro do limite de arquivos
+
+    Outras sessões podem remover arquivos ao mesmo tempo, por isso arquivos
+    que já não existem são ignorados.
+    """
+    static_files = []
+    for static_path in STATIC_DIR.glob("*.pdf"):
+        try:
+            static_files.append((static_path.stat().st_mtime, static_path))
+        except FileNotFoundError:
+            continue
+    static_files.sort()
+    
+    now = time.time()
+    excess = len(static_files) - STATIC_MAX_FILES
+    for index, (modified_at, static_path) in enumerate(static_files):
+        if index < excess or now - modified_at > STATIC_MAX_AGE:
+            static_path.unlink(missing_ok=True)
+
+# Função para publicar um PDF como arquivo estático do app
+def publish_static_pdf(file_id, load_pdf):
+    """Grava o PDF na pasta estática, retornando sua URL
+
+    O nome é o SHA-1 do conteúdo, de modo que o mesmo PDF é gravado uma
+    única vez; enquanto o arquivo existir em disco, o índice por file_id
+    evita chamar load_pdf de novo.
+    """
+    static_index = get_static_index()
+    static_name = static_index.get(file_id)
+    
+    if static_name is not None:
+        try:
+            # Renova o prazo de expiração do arquivo reaproveitado
+            os.utime(STATIC_DIR / static_name)
+        except FileNotFoundError:
+            static_name = None
+    
+    if static_name is None:
+        pdf_bytes = load_pdf()
+        static_name = f"{hashlib.sha1(pdf_bytes).hexdigest()}.pdf"
+        STATIC_DIR.mkdir(exist_ok=True)
+        (STATIC_DIR / static_name).write_bytes(pdf_bytes)
+        static_index[file_id] = static_name
+    
+    # O arquivo recém-publicado é o mais novo e nunca é removido aqui
+    cleanup_static_dir()
+    
+    return f"app/static/{static_name}"
+
+# Função para exibir o botão que abre o PDF em nova aba
+def render_open_button(file_url):
+    """Exibe um botão que abre a URL informada em uma nova aba"""
+    open_link = f"""
+    <a href="{file_url}" target="_blank">
+        <button style="
+            background-color: #4CAF50;
+            color: white;
+            padding: 10px 24px;
+            border: none;
+            border-radius: 4px;
+            cursor: pointer;
+            font-size: 16px;
+        ">
+            Abrir PDF em nova aba
+        </button>
+    </a>
+    """
+    st.markdown(open_link, unsafe_allow_html=True)
+
+# Função para listar os PDFs do bucket
+@st.cache_data(ttl=60, show_spinner=False)
+def list_pdfs(_bucket):
+    """Lista os PDFs do bucket por ID, do mais recente para o mais antigo"""
+    files = {}
+    
+    # Mantém apenas a versão mais recente de cada arquivo
+    for file_version, _ in _bucket.ls():
+        if not file_version.file_name.endswith('.pdf'):
+            continue
+        current = files.get(file_version.file_name)
+        if current is None or file_version.upload_timestamp > current.upload_timestamp:
+            files[file_version.file_name] = file_version
+    
+    # Monta o índice ordenado por data de upload (mais recente primeiro)
+    return {
+        file_version.id_: {
+            "label": f"{file_version.file_name} ({file_version.size/1024:.2f} KB)",
+            "id": file_version.id_,
+            "name": file_version.file_name,
+            "size": file_version.size,
+            "upload_timestamp": file_version.upload_timestamp
+        }
+        for file_version in sorted(
+            files.values(), key=attrgetter("upload_timestamp"), reverse=True
         )
-        # Obtém URL base do arquivo
-        base_url = bucket.get_download_url(file_name)
-        # Combina para formar a URL assinada
-        return f"{base_url}?Authorization={auth_token}"
-    except Exception as e:
-        st.error(f"Erro ao gerar URL assinada: {str(e)}")
-        return None
+    }
 
 # Interface principal
 st.title("Sistema de Gerenciamento de PDFs")
 
+# Remove da pasta pública os PDFs expirados a cada execução
+cleanup_static_dir()
+
+# Inicializa B2 uma única vez para as duas tabs
+try:
+    b2_api, bucket = initialize_b2()
+except Exception as e:
+    st.error(f"Erro ao conectar ao Backblaze: {str(e)}")
+    st.stop()
+
 # Inicializa tabs
 tab1, tab2 = st.tabs(["Upload de PDFs", "Visualizar/Download de PDFs"])
 
-with tab1:
+# Tab de upload (fragmento: interações aqui não reexecutam a outra tab)
+@st.fragment
+def show_uploads(bucket):
+    """Exibe o formulário de upload de PDFs"""
     st.header("Upload de PDF para o Backblaze")
     
-    # Upload de arquivo
-    uploaded_file = st.file_uploader("Escolha um arquivo PDF", type=["pdf"])
+    # Resultado do último envio
+    for is_error, message in st.session_state.pop("upload_messages", []):
+        if is_error:
+            st.error(message)
+        else:
+            st.success(message)
+    
+    # Upload de arquivos
+    uploaded_files = st.file_uploader(
+        "Escolha um ou mais arquivos PDF", type=["pdf"], accept_multiple_files=True
+    )
     
-    if uploaded_file is not None:
-        file_size = len(uploaded_file.getvalue())
-        st.info(f"Arquivo: {uploaded_file.name} ({file_size/1024:.2f} KB)")
+    if uploaded_files:
+        for uploaded_file in uploaded_files:
+            st.info(f"Arquivo: {uploaded_file.name} ({uploaded_file.size/1024:.2f} KB)")
         
         if st.button("Enviar para o Backblaze"):
-            with st.spinner("Enviando arquivo..."):
+            with st.spinner("Enviando arquivos..."):
                 try:
-                    # Inicializa B2
-                    b2_api, bucket = initialize_b2()
-                    
-                    # Prepara os dados do arquivo
-                    file_data = uploaded_file.getvalue()
-                    file_name = uploaded_file.name
-                    
-                    # Upload do arquivo para o B2
-                    file_info = bucket.upload_bytes(
-                        data_bytes=file_data,
-                        file_name=file_name,
-                        content_type='application/pdf'
-                    )
-                    
-                    st.success(f"Arquivo enviado com sucesso! ID: {file_info.id_}")
+                    # Upload dos arquivos para o B2 em paralelo
+                    uploads = upload_many(bucket, uploaded_files)
                     
-                    # Adicionando informações sobre o arquivo
+                    # Adicionando informações sobre os arquivos
                     if 'uploaded_files' not in st.session_state:
                         st.session_state.uploaded_files = []
+                    
+                    upload_messages = []
+                    for uploaded_file, future in uploads:
+                        file_name = uploaded_file.name
+                        try:
+                            file_info = future.result()
+                        except Exception as e:
+                            upload_messages.append(
+                                (True, f"Erro ao enviar {file_name}: {str(e)}")
+                            )
+                            continue
                         
-                    st.session_state.uploaded_files.append({
-                        "name": file_name,
-                        "id": file_info.id_,
-                        "size": file_size,
-                        "timestamp": time.time()
-                    })
+                        upload_messages.append(
+                            (False, f"{file_name} enviado com sucesso! ID: {file_info.id_}")
+                        )
+                        
+                        st.session_state.uploaded_files.append({
+                            "name": file_name,
+                            "id": file_info.id_,
+                            "size": uploaded_file.size,
+                            "timestamp": time.time()
+                        })
+                    
+                    # Invalida a listagem em cache e reexecuta o app inteiro,
+                    # para que a tab de download exiba os novos arquivos; as
+                    # mensagens são exibidas após a reexecução
+                    if any(not is_error for is_error, _ in upload_messages):
+                        list_pdfs.clear()
+                    st.session_state.upload_messages = upload_messages
+                    st.rerun(scope="app")
                     
                 except Exception as e:
-                    st.error(f"Erro ao enviar arquivo: {str(e)}")
+                    st.error(f"Erro ao enviar arquivos: {str(e)}")
 
-with tab2:
+# Tab de visualização/download (fragmento: reexecuta só a listagem e as ações)
+@st.fragment
+def show_downloads(bucket):
+    """Exibe a lista de PDFs do bucket com as opções de visualizar e baixar"""
     st.header("Visualizar/Download de PDFs")
     
     try:
-        # Inicializa B2
-        b2_api, bucket = initialize_b2()
-        
         # Listar arquivos do bucket
-        file_versions = list(bucket.ls())
-        files = {}
-        
-        # Organiza os arquivos mais recentes
-        for file_info_tuple in file_versions:
-            # O primeiro elemento da tupla é o objeto FileVersion
-            file_version = file_info_tuple[0]  
-            if file_version.file_name.endswith('.pdf'):
-                files[file_version.file_name] = {
-                    "id": file_version.id_,
-                    "name": file_version.file_name,
-                    "size": file_version.size,
-                    "upload_timestamp": file_version.upload_timestamp
-                }
+        files = list_pdfs(bucket)
         
         if files:
-            # Converte para lista para facilitar exibição
-            file_list = list(files.values())
-            
-            # Ordena por data de upload (mais recente primeiro)
-            file_list.sort(key=lambda x: x["upload_timestamp"], reverse=True)
-            
-            # Interface para selecionar arquivo
-            selected_filename = st.selectbox(
+            # Interface para selecionar arquivo; as opções são os IDs, para
+            # que o arquivo selecionado venha sempre da listagem atual
+            selected_id = st.selectbox(
                 "Selecione um arquivo PDF", 
-                options=[f"{file['name']} ({file['size']/1024:.2f} KB)" for file in file_list],
+                options=list(files),
+                format_func=lambda file_id: files[file_id]["label"],
                 index=0
             )
-            
-            # Encontra o arquivo selecionado
-            selected_index = [f"{file['name']} ({file['size']/1024:.2f} KB)" for file in file_list].index(selected_filename)
-            selected_file = file_list[selected_index]
+            selected_file = files[selected_id]
             
             # Opções para visualizar ou baixar
             col1, col2 = st.columns(2)
@@ -177,54 +364,20 @@ with tab2:
                             file_name = selected_file["name"]
                             
                             # Gera URL temporária autorizada
-                            file_url = get_signed_url(bucket, file_name)
-                            
-                            if file_url:
+                            try:
+                                file_url = get_signed_url(bucket, file_name)
                                 st.success("URL autorizada gerada com sucesso!")
+                            except Exception as e:
+                                st.error(f"Não foi possível gerar a URL ({str(e)}). Tentando método alternativo...")
                                 
-                                # Botão para abrir em nova aba
-                                open_link = f"""
-                                <a href="{file_url}" target="_blank">
-                                    <button style="
-                                        background-color: #4CAF50;
-                                        color: white;
-                                        padding: 10px 24px;
-                                        border: none;
-                                        border-radius: 4px;
-                                        cursor: pointer;
-                                        font-size: 16px;
-                                    ">
-                                        Abrir PDF em nova aba
-                                    </button>
-                                </a>
-                                """
-                                st.markdown(open_link, unsafe_allow_html=True)
-                            else:
-                                st.error("Não foi possível gerar a URL. Tentando método alternativo...")
-                                
-                                # Método alternativo - baixa o arquivo e exibe com base64
-                                pdf_bytes = download_file_from_b2(bucket, file_id, file_name)
-                                b64_pdf = base64.b64encode(pdf_bytes).decode()
-                                
+                                # Método alternativo - serve o arquivo pela pasta estática do app
+                                file_url = publish_static_pdf(
+                                    file_id, lambda: get_pdf(bucket, file_id)
+                                )
                                 st.success("PDF carregado usando método alternativo!")
-                                
-                                # Botão para abrir em nova aba (alternativo)
-                                alt_href = f"""
-                                <a href="data:application/pdf;base64,{b64_pdf}" target="_blank">
-                                    <button style="
-                                        background-color: #4CAF50;
-                                        color: white;
-                                        padding: 10px 24px;
-                                        border: none;
-                                        border-radius: 4px;
-                                        cursor: pointer;
-                                        font-size: 16px;
-                                    ">
-                                        Abrir PDF em nova aba
-                                    </button>
-                                </a>
-                                """
-                                st.markdown(alt_href, unsafe_allow_html=True)
+                            
+                            # Botão para abrir em nova aba
+                            render_open_button(file_url)
                             
                         except Exception as e:
                             st.error(f"Erro ao visualizar arquivo: {str(e)}")
@@ -237,8 +390,8 @@ with tab2:
                             file_id = selected_file["id"]
                             file_name = selected_file["name"]
                             
-                            # Baixa o arquivo usando nossa função personalizada
-                            pdf_bytes = download_file_from_b2(bucket, file_id, file_name)
+                            # Baixa o arquivo (ou reaproveita o download da sessão)
+                            pdf_bytes = get_pdf(bucket, file_id)
                             
                             # Usando o download_button nativo do Streamlit
                             st.download_button(
@@ -256,6 +409,12 @@ with tab2:
     except Exception as e:
         st.error(f"Erro ao listar arquivos: {str(e)}")
 
+with tab1:
+    show_uploads(bucket)
+
+with tab2:
+    show_downloads(bucket)
+
 # Rodapé
 st.markdown("---")
 st.caption("Sistema de Gerenciamento de PDFs com Backblaze B2")
\ No newline at end of file
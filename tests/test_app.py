@@ -0,0 +1,245 @@
+import hashlib
+import os
+import shutil
+import time
+from pathlib import Path
+from unittest import mock
+
+import pytest
+import streamlit as st
+from b2sdk.v2 import (
+    B2Api,
+    B2HttpApiConfig,
+    Bucket,
+    InMemoryAccountInfo,
+    RawSimulator,
+)
+from streamlit.testing.v1 import AppTest
+
+APP_PATH = str(Path(__file__).resolve().parent.parent / "app.py")
+
+PDF_CONTENT = b"%PDF-1.4 conteudo de teste"
+
+
+@pytest.fixture
+def b2_bucket():
+    """Bucket privado no simulador do b2sdk com um PDF enviado"""
+    b2_api = B2Api(
+        InMemoryAccountInfo(),
+        api_config=B2HttpApiConfig(_raw_api_class=RawSimulator),
+    )
+    key_id, key = b2_api.session.raw_api.create_account()
+    b2_api.authorize_account("production", key_id, key)
+    bucket = b2_api.create_bucket("test-bucket", "allPrivate")
+    bucket.upload_bytes(PDF_CONTENT, "teste.pdf")
+
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    with mock.patch("b2sdk.v2.B2Api", return_value=b2_api):
+        yield key_id, key, bucket
+
+
+@pytest.fixture
+def app_dir(tmp_path):
+    """Cópia do app em tmp_path, para que a pasta static fique fora do repo"""
+    shutil.copy(APP_PATH, tmp_path / "app.py")
+    return tmp_path
+
+
+@pytest.fixture
+def new_app(b2_bucket, app_dir):
+    key_id, key, bucket = b2_bucket
+
+    def make_app():
+        at = AppTest.from_file(str(app_dir / "app.py"))
+        at.secrets["B2_KEY_ID"] = key_id
+        at.secrets["B2_APPLICATION_KEY"] = key
+        at.secrets["B2_BUCKET_NAME"] = bucket.name
+        return at
+
+    return make_app
+
+
+@pytest.fixture
+def app(new_app):
+    return new_app().run()
+
+
+def click(at, label):
+    next(button for button in at.button if button.label == label).click()
+    return at.run()
+
+
+def test_lists_pdfs(app):
+    assert not app.exception
+    assert app.selectbox[0].options == [f"teste.pdf ({len(PDF_CONTENT)/1024:.2f} KB)"]
+
+
+def test_download_pdf(app):
+    at = click(app, "Download PDF")
+
+    assert not at.exception
+    assert not at.error
+    assert list(at.session_state.pdf_cache.values()) == [PDF_CONTENT]
+
+
+def test_view_pdf_uses_signed_url(app):
+    at = click(app, "Visualizar PDF")
+
+    assert not at.exception
+    assert not at.error
+    assert any("Authorization=" in markdown.value for markdown in at.markdown)
+
+
+def test_failed_authorization_is_not_cached(new_app):
+    get_download_authorization = Bucket.get_download_authorization
+    calls = []
+
+    def flaky_authorization(self, *args, **kwargs):
+        calls.append(args)
+        if len(calls) == 1:
+            raise RuntimeError("falha temporária")
+        return get_download_authorization(self, *args, **kwargs)
+
+    with mock.patch.object(Bucket, "get_download_authorization", flaky_authorization):
+        at = click(new_app().run(), "Visualizar PDF")
+        assert "falha temporária" in at.error[0].value
+
+        at = click(at, "Visualizar PDF")
+
+    assert len(calls) == 2
+    assert not at.error
+    assert any("Authorization=" in markdown.value for markdown in at.markdown)
+
+
+def test_persistent_authorization_failure_keeps_listing_cache(new_app):
+    patch_ls, ls_calls = count_calls("ls")
+    with mock.patch.object(
+        Bucket, "get_download_authorization", failing_authorization
+    ), patch_ls:
+        at = new_app().run()
+        for _ in range(4):
+            at = click(at, "Visualizar PDF")
+
+    assert len(ls_calls) == 1
+    assert all("sem permissão shareFiles" in error.value for error in at.error)
+
+
+def upload(at, *file_names):
+    at.file_uploader[0].set_value(
+        [(file_name, PDF_CONTENT, "application/pdf") for file_name in file_names]
+    )
+    return click(at.run(), "Enviar para o Backblaze")
+
+
+def test_upload_reports_each_file(app, b2_bucket):
+    _, _, bucket = b2_bucket
+    bucket_upload = Bucket.upload
+
+    def failing_upload(self, upload_source, file_name, *args, **kwargs):
+        if file_name == "ruim.pdf":
+            raise RuntimeError("falha no envio")
+        return bucket_upload(self, upload_source, file_name, *args, **kwargs)
+
+    with mock.patch.object(Bucket, "upload", failing_upload):
+        at = upload(app, "novo.pdf", "ruim.pdf")
+
+    assert not at.exception
+    assert [error.value for error in at.error] == [
+        "Erro ao enviar ruim.pdf: falha no envio"
+    ]
+    assert [success.value for success in at.success][0].startswith(
+        "novo.pdf enviado com sucesso!"
+    )
+    uploaded_names = [file_version.file_name for file_version, _ in bucket.ls()]
+    assert sorted(uploaded_names) == ["novo.pdf", "teste.pdf"]
+    assert [file["name"] for file in at.session_state.uploaded_files] == ["novo.pdf"]
+
+
+def failing_authorization(self, *args, **kwargs):
+    raise RuntimeError("sem permissão shareFiles")
+
+
+def make_static_files(static_dir, count, age=0):
+    static_dir.mkdir(exist_ok=True)
+    now = time.time()
+    paths = []
+    for index in range(count):
+        path = static_dir / f"antigo-{age}-{index:02d}.pdf"
+        path.write_bytes(b"%PDF")
+        modified_at = now - age - count + index
+        os.utime(path, (modified_at, modified_at))
+        paths.append(path)
+    return paths
+
+
+def test_view_falls_back_to_static_file(new_app, app_dir):
+    with mock.patch.object(Bucket, "get_download_authorization", failing_authorization):
+        at = click(new_app().run(), "Visualizar PDF")
+
+    static_name = f"{hashlib.sha1(PDF_CONTENT).hexdigest()}.pdf"
+    assert (app_dir / "static" / static_name).read_bytes() == PDF_CONTENT
+    assert any(
+        f'href="app/static/{static_name}"' in markdown.value for markdown in at.markdown
+    )
+    assert "sem permissão shareFiles" in at.error[0].value
+
+
+def test_expired_static_files_are_removed_on_every_run(new_app, app_dir):
+    expired = make_static_files(app_dir / "static", 2, age=60 * 60)
+    recent = make_static_files(app_dir / "static", 2)
+
+    new_app().run()
+
+    assert not any(path.exists() for path in expired)
+    assert all(path.exists() for path in recent)
+
+
+def test_static_dir_is_bounded(new_app, app_dir):
+    make_static_files(app_dir / "static", 25)
+
+    with mock.patch.object(Bucket, "get_download_authorization", failing_authorization):
+        click(new_app().run(), "Visualizar PDF")
+
+    static_files = sorted(path.name for path in (app_dir / "static").glob("*.pdf"))
+    assert len(static_files) == 20
+    assert f"{hashlib.sha1(PDF_CONTENT).hexdigest()}.pdf" in static_files
+    assert "antigo-0-24.pdf" in static_files
+    assert "antigo-0-05.pdf" not in static_files
+
+
+def count_calls(method_name):
+    """Substitui um método de Bucket, contando suas chamadas"""
+    method = getattr(Bucket, method_name)
+    calls = []
+
+    def counted(self, *args, **kwargs):
+        calls.append(args)
+        return method(self, *args, **kwargs)
+
+    return mock.patch.object(Bucket, method_name, counted), calls
+
+
+def test_upload_refreshes_download_tab(app):
+    at = upload(app, "novo.pdf")
+
+    assert not at.exception
+    assert at.success[0].value.startswith("novo.pdf enviado com sucesso!")
+    assert [option.split(" ")[0] for option in at.selectbox[0].options] == [
+        "novo.pdf",
+        "teste.pdf",
+    ]
+
+
+def test_failed_upload_keeps_listing_cache(app):
+    def failing_upload(self, *args, **kwargs):
+        raise RuntimeError("falha no envio")
+
+    patch_ls, ls_calls = count_calls("ls")
+    with mock.patch.object(Bucket, "upload", failing_upload), patch_ls:
+        at = upload(app, "ruim.pdf")
+
+    assert [error.value for error in at.error] == [
+        "Erro ao enviar ruim.pdf: falha no envio"
+    ]
+    assert ls_calls == []